@@ -1,24 +1,106 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from datetime import datetime, timedelta, timezone 
-import json
+import orjson
+import gzip
+import hashlib
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy 
-from sqlalchemy import text # 導入 text 用於清空操作
+from sqlalchemy import event, func, insert, select, text, update # 導入 text 用於清空操作
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, raiseload
+import sqlite3
 
 # 定義台灣時區 (UTC+8)
 TAIWAN_TZ = timezone(timedelta(hours=8))
 
 
+# VVVV 使用 orjson 取代標準函式庫 json，所有 jsonify / get_json 皆會套用 VVVV
+class OrjsonProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=self.default), mimetype=self.mimetype)
+# ^^^^ 使用 orjson ^^^^
+
+
 # --- 初始化 Flask 應用 ---
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 # 啟用 CORS：允許前端 (例如在不同 port 運行) 訪問後端 API
 CORS(app) 
 
 # --- 模擬資料庫 ---
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///site.db' # 數據庫檔案將存為 site.db
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False 
+# 連線池設定：允許跨執行緒共用 SQLite 連線，池大小需涵蓋每個 worker 的執行緒數 (見 gunicorn.conf.py)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'connect_args': {'check_same_thread': False},
+    'pool_size': 10,
+    'max_overflow': 5,
+    'pool_pre_ping': True,
+}
 db = SQLAlchemy(app)
 
+# VVVV SQLite 連線設定：WAL 模式與 PRAGMA 調校 VVVV
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    """
+    每個新的 SQLite 連線建立時套用 PRAGMA (WAL 讓讀寫可同時進行，減少 fsync)
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return # 非 SQLite (例如 PostgreSQL) 不處理
+    # 停用 pysqlite 自動發出的 BEGIN，改由下方 begin 事件控制交易模式
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-65536") # 64 MB
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA busy_timeout=30000") # 30 秒
+    cursor.close()
+
+
+@event.listens_for(Engine, "begin")
+def begin_sqlite_transaction(conn):
+    """
+    SQLite 交易開始時發出 BEGIN；寫入交易 (見 acquire_write_lock) 使用 BEGIN IMMEDIATE
+    """
+    if conn.dialect.name != 'sqlite':
+        return
+    conn.exec_driver_sql(f"BEGIN {conn.get_execution_options().get('sqlite_begin', 'DEFERRED')}")
+
+
+def acquire_write_lock():
+    """
+    在寫入交易 (with db.session.begin()) 的開頭呼叫：以 BEGIN IMMEDIATE 立即取得寫入鎖，
+    同時下單時後到者會依 busy_timeout 等待，而不是在寫入途中遇到 SQLITE_BUSY
+    """
+    db.session.connection(execution_options={'sqlite_begin': 'IMMEDIATE'})
+# ^^^^ SQLite 連線設定 ^^^^
+
+
+# VVVV 開發模式：偵測 N+1 查詢 VVVV
+if app.debug:
+    @event.listens_for(Session, "do_orm_execute")
+    def raise_on_lazy_load(orm_execute_state):
+        """
+        開發模式下，任何未預先載入 (joinedload / selectinload 等) 的關聯在存取時若需要額外查詢，直接拋出例外
+        """
+        if (
+            orm_execute_state.is_select
+            and not orm_execute_state.is_column_load
+            and not orm_execute_state.is_relationship_load
+        ):
+            orm_execute_state.statement = orm_execute_state.statement.options(raiseload('*', sql_only=True))
+# ^^^^ 開發模式：偵測 N+1 查詢 ^^^^
+
 # VVVV 新增 ContactInfo 資料表 VVVV
 class ContactInfo(db.Model):
     __tablename__ = 'contact_info'
@@ -27,6 +109,7 @@ class ContactInfo(db.Model):
     contact_phone = db.Column(db.String(100), nullable=False)
     delivery_address = db.Column(db.String(255), nullable=True)
     pickup_type = db.Column(db.String(50), nullable=False) # 現場取餐 / 外送
+    phone_last3 = db.Column(db.String(3), index=True) # 手機後三碼 (下單時寫入，供查詢使用)
 
     def __repr__(self):
         return f"ContactInfo('{self.contact_name}', '{self.contact_phone}')"
@@ -35,24 +118,100 @@ class ContactInfo(db.Model):
 
 # VVVV 修改 Order 資料表：使用外鍵關聯 ContactInfo VVVV
 class Order(db.Model):
+    __table_args__ = (
+        # 依手機後三碼查詢時，JOIN 到 order 需以 contact_id 查找，此索引讓查找不必掃描整張資料表
+        # (後三碼可能對應多個聯絡人，依 created_at 排序時仍需額外排序)
+        db.Index('ix_order_contact_created', 'contact_id', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, unique=True, nullable=False) # 您的訂單編號
     status = db.Column(db.String(20), nullable=False, default='pending')
     final_amount = db.Column(db.Float, nullable=False)
     items_json = db.Column(db.Text, nullable=False) 
+    content_summary = db.Column(db.Text) # 下單時產生的內容摘要，列表查詢直接讀取
     created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(TAIWAN_TZ))
+    created_at_iso = db.Column(db.String(25)) # 下單時間的 ISO 字串 (例如 2024-01-01T12:00:00+08:00)，列表查詢直接回傳
     
     # 外鍵到 ContactInfo
     contact_id = db.Column(db.Integer, db.ForeignKey('contact_info.id'), nullable=False)
     
     # 建立關係屬性，方便從 Order 訪問 ContactInfo 的資料
+    # 預先載入原則：多對一 (Order.contact) 可用 joinedload，已經 JOIN 過的查詢用 contains_eager；
+    # 一對多集合 (ContactInfo.orders、Order.items) 請用 selectinload，避免 JOIN 造成資料列重複膨脹
     contact = db.relationship('ContactInfo', backref='orders', lazy=True)
 
+    # 訂單品項 (一對多)
+    items = db.relationship('OrderItem', backref='order', lazy=True)
+
     def __repr__(self):
         return f"Order('{self.order_id}', '{self.status}', '{self.final_amount}')"
 # ^^^^ 修改 Order 資料表 ^^^^
 
 
+# VVVV 新增 OrderItem 資料表：訂單品項正規化，讀取時不需再解析 items_json VVVV
+class OrderItem(db.Model):
+    __tablename__ = 'order_item'
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True) # 對應 Order.id
+    menu_item_id = db.Column(db.Integer, nullable=True) # 對應 MENU_ITEMS 的 id
+    name = db.Column(db.String(100), nullable=False)
+    options = db.Column(db.String(255), nullable=False, default='') # 例如: 甜度 / 冰塊 / 加料
+    quantity = db.Column(db.Integer, nullable=False)
+    price = db.Column(db.Float, nullable=False) # 單價 (含加料)
+
+    def __repr__(self):
+        return f"OrderItem('{self.name}', '{self.quantity}')"
+# ^^^^ 新增 OrderItem 資料表 ^^^^
+
+
+def build_order_item_rows(order_pk, cart_items):
+    """
+    將前端的購物車品項轉為 OrderItem 的欄位字典 (供 insert 批次寫入)
+    """
+    return [
+        {
+            "order_id": order_pk,
+            "menu_item_id": item.get('menuId'),
+            "name": item.get('name', '未知飲品'),
+            "options": item.get('options') or '', # 前端可能送出 null
+            "quantity": item.get('quantity', 1),
+            "price": item.get('price', 0),
+        }
+        for item in cart_items
+    ]
+
+
+def format_item(item):
+    """
+    單一品項的顯示文字，例如: 珍珠奶茶 (半糖) x 2 (只取選項中的第一段)
+    """
+    options = (item.get('options') or '').split(' / ', 1)[0]
+    return f"{item.get('name', '未知飲品')} ({options}) x {item.get('quantity', 1)}"
+
+
+def build_content_summary(cart_items):
+    """
+    將購物車品項組成顯示用的內容摘要，例如: 珍珠奶茶 (半糖) x 2, 四季春青茶 (無糖) x 1
+    """
+    return ", ".join(map(format_item, cart_items))
+
+
+def is_valid_cart(cart_items):
+    """
+    檢查購物車格式：需為 list，每個品項都有數字型別的 price 與整數 quantity (不接受 true / false)，
+    name 與 options 若有提供則需為字串
+    """
+    return isinstance(cart_items, list) and all(
+        isinstance(item, dict)
+        and isinstance(item.get('price'), (int, float)) and not isinstance(item.get('price'), bool)
+        and isinstance(item.get('quantity'), int) and not isinstance(item.get('quantity'), bool)
+        and isinstance(item.get('name', ''), str)
+        and isinstance(item.get('options', ''), str)
+        for item in cart_items
+    )
+
+
 # 菜單資料 (與前端保持一致)
 MENU_ITEMS = [
     {"id": 1, "name": "珍珠奶茶", "price": 60, "category": "milk-tea", "isPopular": True},
@@ -61,15 +220,29 @@ MENU_ITEMS = [
     {"id": 4, "name": "草莓優格冰沙", "price": 85, "category": "seasonal", "isPopular": False},
 ]
 
+# 菜單為常數，啟動時預先序列化 (含 gzip 壓縮版本) 並計算 ETag，每次請求直接回傳
+_MENU_BODY = orjson.dumps(MENU_ITEMS)
+_MENU_GZIP = gzip.compress(_MENU_BODY, 6)
+_MENU_ETAG = hashlib.md5(_MENU_BODY).hexdigest()
+_MENU_GZIP_ETAG = f"{_MENU_ETAG}-gzip" # 壓縮後內容不同，需使用不同的 ETag
+
 
 # --- API 端點定義 ---
 
 @app.route('/api/menu', methods=['GET'])
 def get_menu():
     """
-    [GET] 取得完整的菜單列表
+    [GET] 取得完整的菜單列表 (支援 If-None-Match，未變更時回傳 304；用戶端接受 gzip 時回傳預先壓縮的內容)
     """
-    return jsonify(MENU_ITEMS)
+    use_gzip = request.accept_encodings['gzip'] > 0
+    etag = _MENU_GZIP_ETAG if use_gzip else _MENU_ETAG
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'public, max-age=300', 'Vary': 'Accept-Encoding'}
+    if etag in request.if_none_match:
+        return Response(status=304, headers=headers)
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(_MENU_GZIP, mimetype='application/json', headers=headers)
+    return Response(_MENU_BODY, mimetype='application/json', headers=headers)
 
 @app.route('/api/order', methods=['POST'])
 def place_order():
@@ -80,27 +253,23 @@ def place_order():
     if not request.is_json:
         return jsonify({"message": "Missing JSON in request"}), 400
 
-    data = request.get_json()
+    # 直接將原始 bytes 交給 orjson 解析，不經過 Flask 的 JSON 解析流程
+    try:
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        return jsonify({"message": "Malformed JSON in request"}), 400
 
-    if 'cartItems' not in data or 'contactInfo' not in data:
+    if not isinstance(data, dict) or 'cartItems' not in data or 'contactInfo' not in data or not is_valid_cart(data['cartItems']):
         return jsonify({"message": "Invalid order data structure"}), 400
         
-    # 1. 計算訂單總金額
-    total_amount = 0
-    for item in data['cartItems']:
-        total_amount += item.get('price', 0) * item.get('quantity', 0)
+    # 1. 計算訂單總金額 (品項格式已於上方檢查，可直接取值)
+    total_amount = sum(item['price'] * item['quantity'] for item in data['cartItems'])
     
     # 2. 計算運費與最終金額
     DELIVERY_FEE = 50 if data.get('pickupType') == 'delivery' else 0
     final_amount = total_amount + DELIVERY_FEE
 
-    # 3. 處理訂單編號
-    last_order = Order.query.order_by(Order.order_id.desc()).first()
-    new_order_id = 1001 
-    if last_order:
-        new_order_id = last_order.order_id + 1
-    
-    # 4. 處理聯絡資訊與地址
+    # 3. 處理聯絡資訊與地址
     contact_info = data.get('contactInfo', {})
     contact_name = contact_info.get('name', 'N/A')
     contact_phone = contact_info.get('phone', 'N/A')
@@ -112,84 +281,98 @@ def place_order():
     if delivery_address == "":
          delivery_address = None
 
-    # VVVV 5. 儲存 ContactInfo 實體 VVVV
-    new_contact = ContactInfo(
-        contact_name=contact_name,
-        contact_phone=contact_phone,
-        delivery_address=delivery_address,
-        pickup_type=pickup_type
-    )
-    db.session.add(new_contact)
-    db.session.flush() # 獲取 new_contact 的 ID
-    # ^^^^ 5. 儲存 ContactInfo 實體 ^^^^
-
-
-    # 6. 建立 Order 實體
-    new_db_order = Order(
-        order_id=new_order_id,
-        status="pending",
-        final_amount=final_amount,
-        items_json=json.dumps(data['cartItems']),
-        contact_id=new_contact.id # 使用外鍵 ID
-    )
-
-    # 提交到資料庫
+    # VVVV 4~7. 單一交易寫入：訂單編號、ContactInfo、Order、OrderItem 只需一次 COMMIT VVVV
+    # 寫入一律使用 Core insert()，不建立 ORM 實體 (寫入後不會再讀取，省去 identity map 與事件處理的成本)；
+    # ORM 關聯只用於讀取端點
     try:
-        db.session.add(new_db_order)
-        db.session.commit()
+        with db.session.begin():
+            # 4. 處理訂單編號：先取得寫入鎖 (BEGIN IMMEDIATE)，再以 MAX 計算，避免同時下單取得相同編號
+            acquire_write_lock()
+            new_order_id = db.session.execute(
+                select(func.coalesce(func.max(Order.order_id), 1000) + 1)
+            ).scalar()
+
+            # 5. 儲存 ContactInfo，以 RETURNING 直接取得 ID (不需額外 flush)
+            contact_id = db.session.execute(
+                insert(ContactInfo).values(
+                    contact_name=contact_name,
+                    contact_phone=contact_phone,
+                    delivery_address=delivery_address,
+                    pickup_type=pickup_type,
+                    phone_last3=contact_phone[-3:]
+                ).returning(ContactInfo.id)
+            ).scalar_one()
+
+            # 6. 儲存 Order
+            created_at = datetime.now(TAIWAN_TZ)
+            order_pk = db.session.execute(
+                insert(Order).values(
+                    order_id=new_order_id,
+                    status="pending",
+                    final_amount=final_amount,
+                    items_json=orjson.dumps(data['cartItems']).decode(), # 保留原始內容作為稽核紀錄
+                    content_summary=build_content_summary(data['cartItems']),
+                    created_at=created_at,
+                    created_at_iso=created_at.isoformat(timespec='seconds'),
+                    contact_id=contact_id # 使用外鍵 ID
+                ).returning(Order.id)
+            ).scalar_one()
+
+            # 7. 批次儲存 OrderItem
+            if data['cartItems']:
+                db.session.execute(insert(OrderItem), build_order_item_rows(order_pk, data['cartItems']))
     except Exception as e:
-        db.session.rollback()
         print(f"Database error: {e}")
         return jsonify({"message": "Database insertion failed"}), 500
+    # ^^^^ 4~7. 單一交易寫入 ^^^^
 
     return jsonify({
         "message": "Order placed successfully!",
-        "order_id": new_db_order.order_id,
-        "final_amount": new_db_order.final_amount,
+        "order_id": new_order_id,
+        "final_amount": float(final_amount), # 與資料庫 Float 欄位一致
         "estimated_pickup_time": "Time calculation removed for simplicity, or use calculated time here"
     }), 201
 
 @app.route('/api/orders/all', methods=['GET'])
 def get_all_orders():
     """
-    [GET] 取得所有訂單，回傳後台所需資訊。
+    [GET] 取得訂單列表 (分頁)，回傳後台所需資訊。
+    查詢參數：limit (每頁筆數，預設 50，上限 200)、before_id (取 id 小於此值的訂單，用於載入下一頁)
     """
-    
-    # 使用 joinedload 預先載入 ContactInfo，減少資料庫查詢次數
-    orders = Order.query.options(db.joinedload(Order.contact)).order_by(Order.id.desc()).all()
-    
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    before_id = request.args.get('before_id', type=int)
+
+    # 只選取需要的欄位並 JOIN ContactInfo，略過 ORM 實體的建立
+    stmt = (
+        select(
+            Order.id, Order.order_id, Order.status, Order.final_amount, Order.content_summary, Order.created_at_iso,
+            ContactInfo.contact_name, ContactInfo.phone_last3, ContactInfo.pickup_type, ContactInfo.delivery_address,
+        )
+        .join(ContactInfo)
+        .order_by(Order.id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        stmt = stmt.where(Order.id < before_id)
+    rows = db.session.execute(stmt).all()
+
     orders_list = []
-    for order in orders:
-        
-        # VVVV 從 ContactInfo 實體獲取聯絡人資訊 VVVV
-        contact = order.contact
-        customer_name = contact.contact_name
-        phone_full = contact.contact_phone if contact.contact_phone else "N/A"
-        phone_last_three = phone_full 
+    for order in rows:
         
-        # 處理訂單內容 (items_json)
-        try:
-            items_data = json.loads(order.items_json)
-            content_summary = []
-            for item in items_data:
-                options = item.get('options', '').split(' / ')[0] 
-                summary = f"{item.get('name', '未知飲品')} ({options}) x {item.get('quantity', 1)}"
-                content_summary.append(summary)
-            order_content = ", ".join(content_summary)
-        except:
-            order_content = "無法解析訂單內容"
-            
+        # VVVV 從 JOIN 結果獲取聯絡人資訊 VVVV
+        customer_name = order.contact_name
+        phone_last_three = order.phone_last3 if order.phone_last3 else "N/A"
         
         orders_list.append({
             "order_id": order.id,
-            "content": order_content,
+            "content": order.content_summary or "",
             "final_amount": order.final_amount,
             "customer_name": customer_name,
             "contact_phone_last_three": phone_last_three,
             "status": order.status,
-            "pickup_type": contact.pickup_type, # 從 ContactInfo 獲取
-            "delivery_address": contact.delivery_address, # 從 ContactInfo 獲取
-            "created_at": order.created_at.isoformat(),
+            "pickup_type": order.pickup_type, # 從 ContactInfo 獲取
+            "delivery_address": order.delivery_address, # 從 ContactInfo 獲取
+            "created_at": order.created_at_iso,
         })
         
     return jsonify(orders_list)
@@ -204,35 +387,33 @@ def query_order_by_phone():
     if not phone_suffix or len(phone_suffix) != 3 or not phone_suffix.isdigit():
         return jsonify({"message": "請提供正確的 3 位數字手機後三碼進行查詢。"}), 400
 
-    # VVVV 查詢：先找到匹配的 ContactInfo，再用其 ID 查詢 Order VVVV
-    contacts = ContactInfo.query.filter(ContactInfo.contact_phone == phone_suffix).all()
-    if not contacts:
+    # VVVV 查詢：以單一 JOIN 依手機後三碼找出訂單，並直接用該 JOIN 的結果填入 ContactInfo (避免 N+1 查詢) VVVV
+    # 使用 contains_eager 而非 joinedload：joinedload 會再額外產生一次 JOIN
+    orders = (
+        Order.query
+        .join(Order.contact)
+        .options(db.contains_eager(Order.contact))
+        .filter(ContactInfo.phone_last3 == phone_suffix)
+        .order_by(Order.created_at.desc())
+        .all()
+    )
+    if not orders:
         return jsonify({"message": "查無訂單，請確認手機後三碼是否正確。"}), 404
-    
-    contact_ids = [c.id for c in contacts]
-    
-    orders = Order.query.filter(Order.contact_id.in_(contact_ids)).order_by(Order.created_at.desc()).all()
     # ^^^^ 查詢 ^^^^
 
     result_list = []
     for order in orders:
         contact = order.contact # 透過關係屬性訪問聯絡資訊
-        
-        # 處理訂單內容
-        try:
-            items_data = json.loads(order.items_json)
-            content_summary = []
-            for item in items_data:
-                content_summary.append(f"{item.get('name', '飲品')} x {item.get('quantity', 1)}")
-            order_content = ", ".join(content_summary)
-        except:
-            order_content = "無法解析訂單內容"
             
         result_list.append({
             "order_id": order.order_id,
-            "content": order_content,
+            "content": order.content_summary or "",
             "final_amount": order.final_amount,
-            "created_at": order.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            # YYYY-MM-DD HH:MM:SS；尚未回填 created_at_iso 的舊資料改用 created_at 格式化
+            "created_at": (
+                order.created_at_iso[:19].replace('T', ' ') if order.created_at_iso
+                else order.created_at.strftime("%Y-%m-%d %H:%M:%S")
+            ),
             "pickup_type": contact.pickup_type,      
             "address": contact.delivery_address      
         })
@@ -254,25 +435,106 @@ def clear_all_orders():
     [POST] 清空所有訂單和聯絡人記錄，並重設訂單編號。
     """
     try:
-        # 1. 刪除所有訂單記錄
-        db.session.query(Order).delete(synchronize_session='fetch')
-        # 2. 刪除所有聯絡人記錄
-        db.session.query(ContactInfo).delete(synchronize_session='fetch')
-        
-        # 3. 提交變更
-        db.session.commit()
+        # 單一交易內以不帶 WHERE 的 DELETE 清空資料表
+        # SQLite 只有在外鍵檢查關閉時才會套用 truncate 最佳化 (直接清空資料表，不逐筆刪除)，
+        # 而 PRAGMA foreign_keys 在交易內無效，因此先在交易外關閉，清空後再開啟
+        # 資料表的主鍵未使用 AUTOINCREMENT，清空後 id 會自動從 1 重新開始，無需處理 sqlite_sequence
+        with db.engine.connect() as conn:
+            is_sqlite = conn.dialect.name == 'sqlite'
+            dbapi_connection = conn.connection.dbapi_connection
+            if is_sqlite:
+                dbapi_connection.execute("PRAGMA foreign_keys=OFF")
+            try:
+                with conn.execution_options(sqlite_begin='IMMEDIATE').begin():
+                    # 1. 刪除所有訂單品項與訂單記錄
+                    conn.execute(text('DELETE FROM order_item'))
+                    deleted_count = conn.execute(text('DELETE FROM "order"')).rowcount
+                    # 2. 刪除所有聯絡人記錄
+                    conn.execute(text('DELETE FROM contact_info'))
+            finally:
+                if is_sqlite:
+                    dbapi_connection.execute("PRAGMA foreign_keys=ON")
         
         return jsonify({
             "message": "成功刪除所有訂單和聯絡人記錄，訂單編號將從 1001 開始。",
-            "deleted_count": 0
+            "deleted_count": deleted_count
         }), 200
         
     except Exception as e:
-        db.session.rollback()
         print(f"清空訂單失敗: {e}")
         return jsonify({"message": f"清空訂單失敗: {e}"}), 500
 
 
-# --- 運行應用程式 ---
-with app.app_context(): 
-    db.create_all()
\ No newline at end of file
+# VVVV 簡易結構升級：create_all 不會修改既有資料表，需手動補上新增的欄位與索引 VVVV
+SCHEMA_UPGRADES = [
+    # (資料表, 欄位, 欄位型別, 回填既有資料的 SQL)
+    ('contact_info', 'phone_last3', 'VARCHAR(3)', "UPDATE contact_info SET phone_last3 = substr(contact_phone, -3)"),
+    ('order', 'content_summary', 'TEXT', None), # 由下方 items_json 轉換流程回填
+    ('order', 'created_at_iso', 'VARCHAR(25)', """UPDATE "order" SET created_at_iso = strftime('%Y-%m-%dT%H:%M:%S', created_at) || '+08:00'"""),
+]
+
+def upgrade_schema():
+    """
+    為既有資料庫補上 SCHEMA_UPGRADES 中缺少的欄位、建立模型上宣告的索引，並將舊訂單的品項轉入 OrderItem
+    """
+    with db.engine.begin() as conn:
+        inspector = db.inspect(conn)
+        for table, column, column_type, backfill_sql in SCHEMA_UPGRADES:
+            existing_columns = {c['name'] for c in inspector.get_columns(table)}
+            if column in existing_columns:
+                continue
+            conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {column_type}'))
+            if backfill_sql:
+                conn.execute(text(backfill_sql))
+
+        created_index = False
+        for table in db.metadata.sorted_tables:
+            existing_indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    created_index = True
+        if created_index:
+            conn.execute(text("ANALYZE")) # 更新統計資訊，讓查詢規劃器使用新索引
+
+        # 將舊訂單的 items_json 轉入 OrderItem 資料表，並回填 content_summary
+        has_items = Order.items.any()
+        legacy_orders = conn.execute(
+            select(Order.id, Order.items_json, has_items.label('has_items'), Order.content_summary)
+            .where(~has_items | Order.content_summary.is_(None))
+        ).all()
+        for order_pk, items_json, order_has_items, content_summary in legacy_orders:
+            try:
+                cart_items = orjson.loads(items_json)
+                item_rows = build_order_item_rows(order_pk, cart_items)
+                new_summary = build_content_summary(cart_items)
+            except (orjson.JSONDecodeError, AttributeError, TypeError):
+                print(f"無法解析訂單 {order_pk} 的 items_json，略過")
+                item_rows = []
+                new_summary = "無法解析訂單內容"
+            if item_rows and not order_has_items:
+                conn.execute(insert(OrderItem), item_rows)
+            if content_summary is None:
+                conn.execute(update(Order).where(Order.id == order_pk).values(content_summary=new_summary))
+# ^^^^ 簡易結構升級 ^^^^
+
+
+# --- 資料庫初始化 ---
+def setup_database():
+    """
+    建立資料表並執行結構升級；不在匯入時執行，改由 gunicorn master 啟動時 (gunicorn.conf.py) 或 init-db 指令執行一次，
+    避免每個 worker 啟動時重複檢查資料庫結構
+    """
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+        db.engine.dispose() # 關閉此處開啟的連線，避免 fork 後的 worker 共用同一條 SQLite 連線
+
+
+@app.cli.command('init-db')
+def init_db():
+    """
+    本機開發用：flask --app app init-db
+    """
+    setup_database()
+    print("資料庫初始化完成。")
@@ -0,0 +1,11 @@
+# gunicorn 設定 (gunicorn 啟動時會自動讀取此檔)
+workers = 2
+threads = 8
+
+
+def on_starting(server):
+    """
+    master 啟動、fork worker 之前建立 / 升級資料庫結構，只執行一次
+    """
+    from app import setup_database
+    setup_database()
@@ -0,0 +1,5 @@
+# WSGI 進入點：供 gunicorn 等多執行緒 / 多 worker 伺服器使用 (例如: gunicorn wsgi:app)
+from app import app
+
+if __name__ == '__main__':
+    app.run()